@@ -10,10 +10,19 @@ Author: Honeypot AI Team
 import os
 import json
 import re
-from typing import Dict, Any
+import time
+import asyncio
+import threading
+import functools
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing, closing
+from typing import Dict, Any, List, Optional, Tuple
 
+import httpx
 from dotenv import load_dotenv
 from google import genai
+from google.genai import types
 
 # ---------------------------------------------------------------------------
 # Configuration
@@ -32,17 +41,154 @@ if not GEMINI_API_KEY:
         "Please add it to your .env file."
     )
 
-# Initialize the Gemini client
-client = genai.Client(api_key=GEMINI_API_KEY)
+# Connection pool shared by every Gemini call made through one client.
+# Connections are kept alive and HTTP/2 multiplexes concurrent requests over
+# them, so bursts do not pay a new TCP/TLS handshake per call. The pool does
+# not cap concurrency (HTTP/2 runs many requests per connection):
+#   - detect_scam_batch keeps at most DEFAULT_BATCH_CONCURRENCY in flight
+#   - detect_scam_many at most DEFAULT_THREAD_WORKERS
+#   - the API path (detect_scam_async and reply generation in honeypot.py)
+#     makes one call at a time per in-flight request and has no bound of
+#     its own, so it is limited only by the server's request concurrency
+#     (uvicorn --limit-concurrency, Cloud Run --concurrency)
+# Keep these below the project's Gemini requests-per-minute quota or calls
+# will fail with 429.
+GEMINI_MAX_CONNECTIONS = 100
+
+_GEMINI_CLIENT_ARGS = {
+    "http2": True,
+    "limits": httpx.Limits(
+        max_connections=GEMINI_MAX_CONNECTIONS,
+        max_keepalive_connections=GEMINI_MAX_CONNECTIONS
+    )
+}
+
+GEMINI_HTTP_OPTIONS = types.HttpOptions(
+    client_args=_GEMINI_CLIENT_ARGS,
+    async_client_args=_GEMINI_CLIENT_ARGS
+)
+
+# Initialize the Gemini client (module-level singleton - never recreate it
+# per request, or the connection pool is lost)
+client = genai.Client(api_key=GEMINI_API_KEY, http_options=GEMINI_HTTP_OPTIONS)
+
+# Async interface of the same client (shares credentials and configuration)
+aio_client = client.aio
 
 # Model to use for classification
 # For google-genai SDK, use gemini-2.0-flash or gemini-1.5-flash-latest
 MODEL_NAME = "gemini-2.0-flash"
 
+# Instructions are sent as a system instruction and the output format is
+# enforced with a response schema, so each request only carries the message.
+DETECTION_SYSTEM_INSTRUCTION = (
+    "You are an expert scam detection system. Analyze the user's message and "
+    "determine if it is a scam. Set is_scam to true for scams and false for "
+    "legitimate messages, confidence to an integer from 0 to 100, and reason "
+    "to a short explanation (max 50 words)."
+)
+
+DETECTION_RESPONSE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "is_scam": {"type": "boolean"},
+        "confidence": {"type": "integer"},
+        "reason": {"type": "string"}
+    },
+    "required": ["is_scam", "confidence", "reason"]
+}
+
+DETECTION_CONFIG = types.GenerateContentConfig(
+    system_instruction=DETECTION_SYSTEM_INSTRUCTION,
+    response_mime_type="application/json",
+    response_schema=DETECTION_RESPONSE_SCHEMA
+)
+
+# Maximum number of in-flight requests for detect_scam_batch.
+# Keep this below the project's Gemini requests-per-minute quota.
+DEFAULT_BATCH_CONCURRENCY = 50
+
+# Default thread count for detect_scam_many
+DEFAULT_THREAD_WORKERS = 32
+
+# Maximum number of cached verdicts kept by the template cache
+TEMPLATE_CACHE_SIZE = 10_000
+
+# Max exact-duplicate messages kept in detect_scam's LRU cache
+EXACT_CACHE_SIZE = 10_000
+
+# Seconds between status checks while waiting for a Batch API job
+BATCH_POLL_INTERVAL = 30
+
+# Batch API job states after which the job will not change any more
+_BATCH_TERMINAL_STATES = {
+    "JOB_STATE_SUCCEEDED",
+    "JOB_STATE_FAILED",
+    "JOB_STATE_CANCELLED",
+    "JOB_STATE_EXPIRED",
+}
+
 # ---------------------------------------------------------------------------
 # JSON Extraction Utilities
 # ---------------------------------------------------------------------------
 
+# Matches ```json {...} ``` or ``` {...} ```
+_CODE_BLOCK_PATTERN = re.compile(r"```(?:json)?\s*(\{[\s\S]*?\})\s*```")
+
+# Single braces, used to walk candidate objects without backtracking
+_BRACE_PATTERN = re.compile(r"[{}]")
+
+
+def _find_json_object(text: str, braces: List[Tuple[int, str]]) -> Optional[Dict[str, Any]]:
+    """
+    Return the first balanced {...} span in text that parses as JSON.
+    
+    `braces` holds (position, character) for every brace in text, in order.
+    Brace pairs are matched with a stack in one linear pass, then tried
+    in order of their opening brace (outer objects before nested ones).
+    """
+    open_braces = []
+    spans = []
+    for position, char in braces:
+        if char == "{":
+            open_braces.append(position)
+        elif open_braces:
+            spans.append((open_braces.pop(), position))
+    
+    for start, end in sorted(spans):
+        try:
+            return json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            continue
+    
+    return None
+
+
+def _complete_json_object(text: str) -> Optional[Dict[str, Any]]:
+    """
+    Parse the first top-level JSON object of a partial stream, if complete.
+    
+    Returns None while the object is still open (or does not parse yet),
+    so the caller can keep reading chunks.
+    """
+    depth = 0
+    start = -1
+    for match in _BRACE_PATTERN.finditer(text):
+        if match.group() == "{":
+            if depth == 0:
+                start = match.start()
+            depth += 1
+        elif depth:
+            depth -= 1
+            if depth == 0:
+                try:
+                    parsed = json.loads(text[start:match.end()])
+                except json.JSONDecodeError:
+                    return None
+                return parsed if isinstance(parsed, dict) else None
+    return None
+
+
 def extract_json_safe(text: str) -> Dict[str, Any]:
     """
     Safely extract a JSON object from raw model output.
@@ -66,37 +212,40 @@ def extract_json_safe(text: str) -> Dict[str, Any]:
         raise ValueError("Empty response from model")
     
     # Step 1: Try to extract JSON from markdown code block
-    # Matches ```json {...} ``` or ``` {...} ```
-    code_block_pattern = r"```(?:json)?\s*(\{[\s\S]*?\})\s*```"
-    code_match = re.search(code_block_pattern, text)
+    code_match = _CODE_BLOCK_PATTERN.search(text)
     if code_match:
         try:
             return json.loads(code_match.group(1))
         except json.JSONDecodeError:
             pass  # Fall through to next method
     
-    # Step 2: Try to find a JSON object anywhere in the text
-    # Uses greedy matching to find the outermost { }
-    json_pattern = r"\{[^{}]*(?:\{[^{}]*\}[^{}]*)*\}"
-    json_match = re.search(json_pattern, text)
-    if json_match:
-        try:
-            return json.loads(json_match.group())
-        except json.JSONDecodeError:
-            pass  # Fall through to next method
-    
-    # Step 3: Last resort - find anything between first { and last }
-    first_brace = text.find("{")
-    last_brace = text.rfind("}")
-    if first_brace != -1 and last_brace > first_brace:
-        try:
-            return json.loads(text[first_brace:last_brace + 1])
-        except json.JSONDecodeError:
-            pass
+    # Steps 2 and 3 share a single scan for braces; with none there is
+    # nothing left to try
+    braces = [(match.start(), match.group()) for match in _BRACE_PATTERN.finditer(text)]
+    if braces:
+        # Step 2: Try to find a balanced JSON object anywhere in the text
+        # (a linear brace walk; nested-quantifier regexes can backtrack
+        # catastrophically on long responses without a match)
+        found = _find_json_object(text, braces)
+        if found is not None:
+            return found
+        
+        # Step 3: Last resort - find anything between first { and last }
+        first_brace = next((pos for pos, char in braces if char == "{"), -1)
+        last_brace = next((pos for pos, char in reversed(braces) if char == "}"), -1)
+        if first_brace != -1 and last_brace > first_brace:
+            try:
+                return json.loads(text[first_brace:last_brace + 1])
+            except json.JSONDecodeError:
+                pass
     
     raise ValueError(f"No valid JSON found in response: {text[:200]}...")
 
 
+# String values of is_scam that count as true
+_TRUTHY_STRINGS = frozenset({"true", "yes", "1", "y", "t"})
+
+
 def validate_scam_response(data: Dict[str, Any]) -> Dict[str, Any]:
     """
     Validate and normalize the scam detection response.
@@ -110,12 +259,10 @@ def validate_scam_response(data: Dict[str, Any]) -> Dict[str, Any]:
     Returns:
         Normalized dictionary with guaranteed structure
     """
-    # Extract is_scam with type coercion
+    # Extract is_scam with type coercion (bool() covers real booleans too)
     is_scam = data.get("is_scam")
-    if isinstance(is_scam, bool):
-        is_scam_normalized = is_scam
-    elif isinstance(is_scam, str):
-        is_scam_normalized = is_scam.lower() in ("true", "yes", "1")
+    if isinstance(is_scam, str):
+        is_scam_normalized = is_scam.strip().lower() in _TRUTHY_STRINGS
     else:
         is_scam_normalized = bool(is_scam)
     
@@ -123,8 +270,12 @@ def validate_scam_response(data: Dict[str, Any]) -> Dict[str, Any]:
     confidence = data.get("confidence", 0)
     try:
         confidence_normalized = int(confidence)
-        confidence_normalized = max(0, min(100, confidence_normalized))
-    except (TypeError, ValueError):
+        confidence_normalized = (
+            0 if confidence_normalized < 0
+            else 100 if confidence_normalized > 100
+            else confidence_normalized
+        )
+    except (TypeError, ValueError, OverflowError):
         confidence_normalized = 0
     
     # Extract reason with fallback
@@ -139,19 +290,218 @@ def validate_scam_response(data: Dict[str, Any]) -> Dict[str, Any]:
     }
 
 
+# ---------------------------------------------------------------------------
+# Prompt and Result Helpers
+# ---------------------------------------------------------------------------
+
+def _build_prompt(message: str) -> str:
+    """Build the per-request user turn; instructions live in DETECTION_CONFIG."""
+    return f'Message to analyze:\n"""{message}"""'
+
+
+def _is_invalid_message(message: Any) -> bool:
+    """Return True for empty, whitespace-only or non-string input."""
+    return not message or not isinstance(message, str) or not message.strip()
+
+
+def _invalid_message_result() -> Dict[str, Any]:
+    """Result returned for empty or invalid input (no API call is made)."""
+    return {
+        "is_scam": False,
+        "confidence": 0,
+        "reason": "Empty or invalid message"
+    }
+
+
+def _parse_and_validate(raw_text: str) -> Dict[str, Any]:
+    """
+    Turn the raw model output into a validated detection result.
+    
+    Raises:
+        ValueError: If no valid JSON object is found in the output
+    """
+    if not raw_text:
+        return {
+            "is_scam": False,
+            "confidence": 0,
+            "reason": "Empty response from model"
+        }
+    
+    try:
+        parsed_data = json.loads(raw_text)
+    except json.JSONDecodeError:
+        # Structured output should always be plain JSON; keep the lenient
+        # extractor as a safety net for malformed responses
+        parsed_data = extract_json_safe(raw_text)
+    
+    if not isinstance(parsed_data, dict):
+        raise ValueError(f"Expected a JSON object, got: {raw_text[:200]}")
+    
+    return validate_scam_response(parsed_data)
+
+
+def _error_result(error: Exception) -> Dict[str, Any]:
+    """Map an exception raised during detection to a safe result."""
+    if isinstance(error, json.JSONDecodeError):
+        # JSON parsing failed
+        reason = f"JSON parsing error: {str(error)[:50]}"
+    elif isinstance(error, ValueError):
+        # No JSON found in response
+        reason = f"Response format error: {str(error)[:50]}"
+    else:
+        # Catch-all for API errors, network issues, etc.
+        error_msg = str(error)[:100] if str(error) else "Unknown error"
+        reason = f"Detection failed: {error_msg}"
+    
+    return {
+        "is_scam": False,
+        "confidence": 0,
+        "reason": reason
+    }
+
+
+# ---------------------------------------------------------------------------
+# Template Cache
+# ---------------------------------------------------------------------------
+
+# Scam campaigns reuse one template with a different amount, phone number,
+# account or link per message. Masking those parts gives every message of a
+# campaign the same cache key, so only the first one reaches Gemini.
+# Only the parts that vary within a campaign are masked: a link keeps its
+# host and a handle (user@bank, name@domain) keeps its domain, since those
+# are what tell a phishing message apart from the real one.
+_TEMPLATE_MASK_PATTERN = re.compile(
+    r"(?:https?://|(?=www\.))([^\s/?#]+)\S*"   # link -> host
+    r"|\S+@(\S+)"                            # handle -> #@domain
+    r"|\d+",                                  # numbers -> #
+    re.IGNORECASE
+)
+
+# LRU of template key -> validated result
+_template_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_template_cache_lock = threading.Lock()
+
+
+def _mask_variable_part(match: "re.Match[str]") -> str:
+    """Replacement for one _TEMPLATE_MASK_PATTERN match."""
+    host, domain = match.group(1, 2)
+    if host is not None:
+        return host
+    if domain is not None:
+        return "#@" + domain
+    return "#"
+
+
+def _template_key(message: str) -> str:
+    """Normalize a message to its template (lowercased, variable parts masked)."""
+    masked = _TEMPLATE_MASK_PATTERN.sub(_mask_variable_part, message.lower())
+    return " ".join(masked.split())
+
+
+def _cache_get(key: str) -> Optional[Dict[str, Any]]:
+    """Return a copy of the cached result for a template key, if any."""
+    with _template_cache_lock:
+        result = _template_cache.get(key)
+        if result is None:
+            return None
+        _template_cache.move_to_end(key)
+        return dict(result)
+
+
+def _cache_put(key: str, result: Dict[str, Any]) -> None:
+    """Store a model verdict, evicting the least recently used entries."""
+    with _template_cache_lock:
+        _template_cache[key] = dict(result)
+        _template_cache.move_to_end(key)
+        while len(_template_cache) > TEMPLATE_CACHE_SIZE:
+            _template_cache.popitem(last=False)
+
+
+def clear_detection_cache() -> None:
+    """Drop all cached verdicts (exact-message and template caches)."""
+    _detect_cached.cache_clear()
+    with _template_cache_lock:
+        _template_cache.clear()
+
+
 # ---------------------------------------------------------------------------
 # Main Detection Function
 # ---------------------------------------------------------------------------
 
+class _EmptyModelResponse(Exception):
+    """The model streamed no text; the fallback result must not be cached."""
+
+
+def _detect_scam_uncached(message: str) -> Dict[str, Any]:
+    """
+    Run one streamed Gemini classification for a message.
+    
+    Unlike detect_scam this raises on any failure, so errors and fallback
+    results never end up in a cache.
+    
+    Raises:
+        _EmptyModelResponse: If the model returned no text
+        Exception: Any API, network or parsing error
+    """
+    # Call Gemini API, streaming so we can stop reading as soon as the
+    # JSON object is complete instead of waiting for the full response
+    raw_text = ""
+    stream = client.models.generate_content_stream(
+        model=MODEL_NAME,
+        contents=_build_prompt(message),
+        config=DETECTION_CONFIG
+    )
+    with closing(stream):
+        for chunk in stream:
+            raw_text += chunk.text or ""
+            parsed = _complete_json_object(raw_text)
+            if parsed is not None:
+                return validate_scam_response(parsed)
+    
+    if not raw_text:
+        raise _EmptyModelResponse()
+    
+    # Stream ended without a complete object - parse what we have
+    return _parse_and_validate(raw_text)
+
+
+@functools.lru_cache(maxsize=EXACT_CACHE_SIZE)
+def _detect_cached(message: str) -> Dict[str, Any]:
+    """
+    Exact-duplicate cache in front of the template cache and the model.
+    
+    Keyed on the message itself: CPython caches a str's hash, so hashing it
+    again with blake2b would only add work. Entries are evicted least
+    recently used once EXACT_CACHE_SIZE messages are stored.
+    """
+    key = _template_key(message)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    
+    result = _detect_scam_uncached(message)
+    _cache_put(key, result)
+    return result
+
+
 def detect_scam(message: str) -> Dict[str, Any]:
     """
     Classify a message as scam or legitimate using Gemini 1.5 Flash.
     
+    The response is streamed and reading stops as soon as the JSON object
+    is complete.
+    
     This function is designed to be robust:
       - Never throws exceptions to the caller
       - Always returns a valid dictionary
       - Handles malformed model responses gracefully
     
+    Verdicts are cached twice: exact repeats (blasts, retries) hit an LRU
+    keyed on the message, and messages that differ only in numbers, link
+    paths or handle names (same hosts and domains) reuse the verdict of
+    their template without an API call.
+    Use detect_scam.cache_clear() to drop both.
+    
     Args:
         message: The text message to classify
         
@@ -170,78 +520,226 @@ def detect_scam(message: str) -> Dict[str, Any]:
     """
     
     # Handle empty or invalid input
-    if not message or not isinstance(message, str) or not message.strip():
-        return {
-            "is_scam": False,
-            "confidence": 0,
-            "reason": "Empty or invalid message"
-        }
+    if _is_invalid_message(message):
+        return _invalid_message_result()
     
-    # Construct the prompt with strict JSON instructions
-    prompt = f"""You are an expert scam detection system. Analyze the following message and determine if it is a scam.
-
-CRITICAL: You must respond with ONLY a valid JSON object. No explanations, no markdown, no extra text.
+    try:
+        # Copy so callers can't mutate the cached verdict
+        return dict(_detect_cached(message))
+    except _EmptyModelResponse:
+        return _parse_and_validate("")
+    except Exception as e:
+        return _error_result(e)
 
-The JSON must have exactly this structure:
-{{"is_scam": true or false, "confidence": 0-100, "reason": "brief explanation"}}
 
-Rules:
-- "is_scam": boolean (true if scam, false if legitimate)
-- "confidence": integer from 0 to 100
-- "reason": short string explaining why (max 50 words)
+detect_scam.cache_clear = clear_detection_cache
 
-Message to analyze:
-\"\"\"{message}\"\"\"
 
-JSON response:"""
+# ---------------------------------------------------------------------------
+# Async / Concurrent Detection
+# ---------------------------------------------------------------------------
 
+async def detect_scam_async(message: str) -> Dict[str, Any]:
+    """
+    Async variant of detect_scam using the google-genai async client.
+    
+    Same contract as detect_scam: never raises, always returns a valid
+    dictionary. Use this from async code (e.g. FastAPI handlers) so the
+    event loop is not blocked while waiting on Gemini.
+    """
+    if _is_invalid_message(message):
+        return _invalid_message_result()
+    
+    key = _template_key(message)
+    cached = _cache_get(key)
+    if cached is not None:
+        return cached
+    
     try:
-        # Call Gemini API
-        response = client.models.generate_content(
+        raw_text = ""
+        result = None
+        stream = await aio_client.models.generate_content_stream(
             model=MODEL_NAME,
-            contents=prompt
+            contents=_build_prompt(message),
+            config=DETECTION_CONFIG
         )
+        async with aclosing(stream):
+            async for chunk in stream:
+                raw_text += chunk.text or ""
+                parsed = _complete_json_object(raw_text)
+                if parsed is not None:
+                    result = validate_scam_response(parsed)
+                    break
         
-        # Extract the text response
-        raw_text = response.text
+        if result is None:
+            result = _parse_and_validate(raw_text)
         
-        if not raw_text:
-            return {
-                "is_scam": False,
-                "confidence": 0,
-                "reason": "Empty response from model"
-            }
+    except Exception as e:
+        return _error_result(e)
+    
+    if raw_text:
+        _cache_put(key, result)
+    return result
+
+
+async def detect_scam_batch(
+    messages: List[str],
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """
+    Classify many messages concurrently.
+    
+    Requests are issued in parallel with at most `concurrency` in flight
+    at once. Results are returned in the same order as `messages`.
+    
+    Args:
+        messages: Messages to classify
+        concurrency: Maximum number of simultaneous Gemini requests
         
-        # Parse and validate the JSON response
-        parsed_data = extract_json_safe(raw_text)
-        validated_result = validate_scam_response(parsed_data)
+    Returns:
+        List of detection results, one per input message
+    """
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    
+    async def _detect_limited(message: str) -> Dict[str, Any]:
+        async with semaphore:
+            return await detect_scam_async(message)
+    
+    return await asyncio.gather(*[_detect_limited(m) for m in messages])
+
+
+def detect_scam_batch_sync(
+    messages: List[str],
+    concurrency: int = DEFAULT_BATCH_CONCURRENCY
+) -> List[Dict[str, Any]]:
+    """
+    Synchronous wrapper around detect_scam_batch for non-async callers.
+    
+    Must not be called from inside a running event loop.
+    """
+    return asyncio.run(detect_scam_batch(messages, concurrency))
+
+
+def detect_scam_many(
+    messages: List[str],
+    workers: int = DEFAULT_THREAD_WORKERS
+) -> List[Dict[str, Any]]:
+    """
+    Classify many messages from synchronous code using a thread pool.
+    
+    Drop-in for sync callers that cannot use asyncio.run (e.g. code already
+    running inside an event loop's worker thread). The SDK releases the GIL
+    while waiting on the network, so threads scale until the Gemini rate
+    limit is reached. Prefer detect_scam_batch in new async code.
+    
+    Args:
+        messages: Texts to classify
+        workers: Maximum number of concurrent threads
         
-        return validated_result
+    Returns:
+        One detect_scam result per message, in input order
+    """
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(detect_scam, messages))
+
+
+# ---------------------------------------------------------------------------
+# Offline Bulk Detection (Gemini Batch API)
+# ---------------------------------------------------------------------------
+
+def detect_scam_bulk(
+    messages: List[str],
+    poll_interval: float = BATCH_POLL_INTERVAL
+) -> List[Dict[str, Any]]:
+    """
+    Classify a large set of messages with the Gemini Batch API.
+    
+    Batch jobs are billed at a discount compared to online calls but may
+    take minutes (or hours) to complete, so this is meant for offline work
+    such as scoring stored honeypot logs. Keep detect_scam for real-time
+    traffic.
+    
+    Like detect_scam, this never raises: failures are reported per message
+    in the "reason" field.
+    
+    Args:
+        messages: Messages to classify
+        poll_interval: Seconds to wait between job status checks
         
-    except json.JSONDecodeError as e:
-        # JSON parsing failed
-        return {
-            "is_scam": False,
-            "confidence": 0,
-            "reason": f"JSON parsing error: {str(e)[:50]}"
-        }
+    Returns:
+        List of detection results, one per input message, in input order
+    """
+    results: List[Dict[str, Any]] = [None] * len(messages)
+    
+    # Invalid and already-cached messages never leave the process, and
+    # messages sharing a template are sent only once
+    pending: "OrderedDict[str, List[int]]" = OrderedDict()
+    for i, message in enumerate(messages):
+        if _is_invalid_message(message):
+            results[i] = _invalid_message_result()
+            continue
         
-    except ValueError as e:
-        # No JSON found in response
-        return {
-            "is_scam": False,
-            "confidence": 0,
-            "reason": f"Response format error: {str(e)[:50]}"
+        key = _template_key(message)
+        cached = _cache_get(key)
+        if cached is not None:
+            results[i] = cached
+        else:
+            pending.setdefault(key, []).append(i)
+    
+    if not pending:
+        return results
+    
+    inline_requests = [
+        {
+            "contents": [{"role": "user", "parts": [{"text": _build_prompt(messages[indices[0]])}]}],
+            "config": DETECTION_CONFIG
         }
+        for indices in pending.values()
+    ]
+    
+    try:
+        job = client.batches.create(
+            model=MODEL_NAME,
+            src=inline_requests,
+            config={"display_name": "honeypot-scam-detection"}
+        )
+        
+        while job.state.name not in _BATCH_TERMINAL_STATES:
+            time.sleep(poll_interval)
+            job = client.batches.get(name=job.name)
+        
+        if job.state.name != "JOB_STATE_SUCCEEDED":
+            raise RuntimeError(f"Batch job {job.name} ended in state {job.state.name}")
+        
+        responses = list(job.dest.inlined_responses or [])
         
     except Exception as e:
-        # Catch-all for API errors, network issues, etc.
-        error_msg = str(e)[:100] if str(e) else "Unknown error"
-        return {
-            "is_scam": False,
-            "confidence": 0,
-            "reason": f"Detection failed: {error_msg}"
-        }
+        for indices in pending.values():
+            for i in indices:
+                results[i] = _error_result(e)
+        return results
+    
+    # Inline responses are returned in request order
+    for position, (key, indices) in enumerate(pending.items()):
+        try:
+            if position >= len(responses):
+                raise RuntimeError("Missing response from batch job")
+            
+            inline_response = responses[position]
+            if inline_response.error:
+                raise RuntimeError(str(inline_response.error))
+            
+            raw_text = inline_response.response.text
+            result = _parse_and_validate(raw_text)
+            if raw_text:
+                _cache_put(key, result)
+        except Exception as e:
+            result = _error_result(e)
+        
+        for i in indices:
+            results[i] = dict(result)
+    
+    return results
 
 
 # ---------------------------------------------------------------------------
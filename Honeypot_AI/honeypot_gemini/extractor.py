@@ -11,8 +11,14 @@ Extracts sensitive information from scam messages and conversations:
 Part of the Agentic Honeypot for Scam Detection system.
 """
 
+import logging
 import re
-from typing import Dict, List, Any
+import threading
+from typing import TYPE_CHECKING, Dict, List, Any, Optional, Tuple
+
+if TYPE_CHECKING:
+    # Only for annotations; pandas is optional (see extract_intelligence_batch)
+    import pandas as pd
 
 
 # ---------------------------------------------------------------------------
@@ -26,7 +32,8 @@ BANK_ACCOUNT_PATTERN = r'\b\d{9,18}\b'
 UPI_ID_PATTERN = r'\b[a-zA-Z0-9._-]+@[a-zA-Z]{2,}\b'
 
 # Indian Phone Numbers: +91, 91, or 10-digit starting with 6-9
-PHONE_PATTERN = r'(?:\+91[\-\s]?|91[\-\s]?)?[6-9]\d{9}\b'
+# (group 1 captures the 10 core digits, without prefix or separator)
+PHONE_PATTERN = r'(?:\+?91[\-\s]?)?([6-9]\d{9})\b'
 
 # URLs/Phishing Links
 URL_PATTERN = r'https?://[^\s<>"{}|\\^`\[\]]+|www\.[^\s<>"{}|\\^`\[\]]+'
@@ -34,13 +41,29 @@ URL_PATTERN = r'https?://[^\s<>"{}|\\^`\[\]]+|www\.[^\s<>"{}|\\^`\[\]]+'
 # Short URLs (common in scams)
 SHORT_URL_PATTERN = r'\b(?:bit\.ly|tinyurl\.com|goo\.gl|t\.co|is\.gd|buff\.ly|ow\.ly|rebrand\.ly)/[a-zA-Z0-9]+\b'
 
+# Any link: full URLs or bare short links, matched in a single scan
+LINK_PATTERN = f'{URL_PATTERN}|{SHORT_URL_PATTERN}'
+
 # Email addresses
-EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'
+EMAIL_PATTERN = r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b'
 
 # IFSC Code (Indian Financial System Code)
 IFSC_PATTERN = r'\b[A-Z]{4}0[A-Z0-9]{6}\b'
 
 
+# Compiled once at import so extraction calls skip the regex cache lookup
+_RE_BANK = re.compile(BANK_ACCOUNT_PATTERN)
+_RE_UPI = re.compile(UPI_ID_PATTERN, re.IGNORECASE)
+_RE_PHONE = re.compile(PHONE_PATTERN)
+_RE_URL_COMBINED = re.compile(LINK_PATTERN, re.IGNORECASE)
+_RE_EMAIL = re.compile(EMAIL_PATTERN, re.IGNORECASE)
+_RE_IFSC = re.compile(IFSC_PATTERN)
+
+# Cheap presence check used to skip the digit-based patterns
+_RE_DIGIT = re.compile(r'\d')
+
+
+
 # ---------------------------------------------------------------------------
 # Extraction Functions
 # ---------------------------------------------------------------------------
@@ -53,20 +76,18 @@ def extract_bank_accounts(text: str) -> List[str]:
     Filters out numbers that look like phone numbers.
     """
     # Find all digit sequences
-    matches = re.findall(BANK_ACCOUNT_PATTERN, text)
-    
-    # Filter: exclude 10-digit numbers starting with 6-9 (likely phone numbers)
-    filtered = []
-    for match in matches:
-        # Skip if it looks like a phone number
-        if len(match) == 10 and match[0] in '6789':
-            continue
-        # Skip very short numbers (likely not account numbers)
-        if len(match) < 9:
-            continue
-        filtered.append(match)
-    
-    return list(set(filtered))  # Remove duplicates
+    return _filter_bank_accounts(_RE_BANK.findall(text))
+
+
+def _filter_bank_accounts(matches: List[str]) -> List[str]:
+    """Drop phone-shaped digit runs, then deduplicate."""
+    # The pattern already guarantees 9-18 digits; only exclude 10-digit
+    # numbers starting with 6-9 (likely phone numbers), then remove
+    # duplicates keeping first-seen order
+    return list(dict.fromkeys(
+        match for match in matches
+        if not (len(match) == 10 and match[0] in '6789')
+    ))
 
 
 def extract_upi_ids(text: str) -> List[str]:
@@ -75,16 +96,25 @@ def extract_upi_ids(text: str) -> List[str]:
     
     Format: username@provider (e.g., merchant@paytm, 9876543210@ybl)
     """
-    matches = re.findall(UPI_ID_PATTERN, text, re.IGNORECASE)
-    
+    return _filter_upi_ids(_RE_UPI.findall(text))
+
+
+# Common email domains, as "@domain" suffixes. A UPI match holds exactly one
+# "@" followed by the whole provider, so a suffix test is an exact domain test.
+_EMAIL_DOMAIN_SUFFIXES = tuple(
+    f"@{domain}" for domain in ('gmail', 'yahoo', 'hotmail', 'outlook', 'proton', 'mail')
+)
+
+
+def _filter_upi_ids(matches: List[str]) -> List[str]:
+    """Drop handles on common email domains, then deduplicate."""
     # Filter out common email domains to avoid false positives
-    email_domains = {'gmail', 'yahoo', 'hotmail', 'outlook', 'proton', 'mail'}
     filtered = [
-        m for m in matches 
-        if m.split('@')[1].lower() not in email_domains
+        m for m in matches
+        if not m.lower().endswith(_EMAIL_DOMAIN_SUFFIXES)
     ]
     
-    return list(set(filtered))
+    return list(dict.fromkeys(filtered))
 
 
 def extract_phone_numbers(text: str) -> List[str]:
@@ -93,40 +123,26 @@ def extract_phone_numbers(text: str) -> List[str]:
     
     Handles formats: +91XXXXXXXXXX, 91XXXXXXXXXX, XXXXXXXXXX
     """
-    matches = re.findall(PHONE_PATTERN, text)
-    
-    # Normalize: extract just the 10 digits
-    normalized = []
-    for match in matches:
-        # Remove +91, 91, spaces, hyphens
-        digits = re.sub(r'[\+\s\-]', '', match)
-        if digits.startswith('91') and len(digits) > 10:
-            digits = digits[2:]
-        if len(digits) == 10:
-            normalized.append(digits)
-    
-    return list(set(normalized))
+    # findall returns the captured 10 digits, already normalized
+    return list(dict.fromkeys(_RE_PHONE.findall(text)))
 
 
 def extract_urls(text: str) -> List[str]:
     """
     Extract URLs and phishing links from text.
     
-    Includes regular URLs and common URL shorteners.
+    Includes regular URLs and common URL shorteners. A short link that is
+    part of a full URL is reported once, as the full URL.
     """
-    urls = re.findall(URL_PATTERN, text, re.IGNORECASE)
-    short_urls = re.findall(SHORT_URL_PATTERN, text, re.IGNORECASE)
-    
-    all_urls = list(set(urls + short_urls))
-    return all_urls
+    return list(dict.fromkeys(_RE_URL_COMBINED.findall(text)))
 
 
 def extract_emails(text: str) -> List[str]:
     """
     Extract email addresses from text.
     """
-    matches = re.findall(EMAIL_PATTERN, text, re.IGNORECASE)
-    return list(set(matches))
+    matches = _RE_EMAIL.findall(text)
+    return list(dict.fromkeys(matches))
 
 
 def extract_ifsc_codes(text: str) -> List[str]:
@@ -135,8 +151,8 @@ def extract_ifsc_codes(text: str) -> List[str]:
     
     Format: 4 letters + 0 + 6 alphanumeric (e.g., SBIN0001234)
     """
-    matches = re.findall(IFSC_PATTERN, text)
-    return list(set(matches))
+    matches = _RE_IFSC.findall(text)
+    return list(dict.fromkeys(matches))
 
 
 # ---------------------------------------------------------------------------
@@ -147,6 +163,11 @@ def extract_intelligence(text: str) -> Dict[str, Any]:
     """
     Extract all intelligence from a text message or conversation.
     
+    Each pattern is matched independently, so a span that fits several
+    fields (digits inside a link, a UPI handle inside an email) is reported
+    under each of them. extract_intelligence_hs and
+    extract_intelligence_batch return the same results.
+    
     Args:
         text: The message or conversation text to analyze
         
@@ -163,23 +184,37 @@ def extract_intelligence(text: str) -> Dict[str, Any]:
         }
     """
     if not text or not isinstance(text, str):
-        return {
-            "bank_accounts": [],
-            "upi_ids": [],
-            "phone_numbers": [],
-            "phishing_links": [],
-            "emails": [],
-            "ifsc_codes": [],
-            "has_intelligence": False
-        }
+        return _build_result([], [], [], [], [], [])
     
-    bank_accounts = extract_bank_accounts(text)
-    upi_ids = extract_upi_ids(text)
-    phone_numbers = extract_phone_numbers(text)
-    phishing_links = extract_urls(text)
-    emails = extract_emails(text)
-    ifsc_codes = extract_ifsc_codes(text)
+    # Most messages carry no intelligence at all. Skip every pattern whose
+    # required character is missing (plain substring checks are far cheaper
+    # than a regex scan):
+    #   - UPI IDs and emails need "@"
+    #   - bank accounts, phone numbers and IFSC codes need a digit
+    #   - URLs need "://" or "www.", short links need "/"
+    has_at = "@" in text
+    has_digit = _RE_DIGIT.search(text) is not None
+    has_url = "/" in text or "www." in text.lower()
     
+    return _build_result(
+        bank_accounts=extract_bank_accounts(text) if has_digit else [],
+        upi_ids=extract_upi_ids(text) if has_at else [],
+        phone_numbers=extract_phone_numbers(text) if has_digit else [],
+        phishing_links=extract_urls(text) if has_url else [],
+        emails=extract_emails(text) if has_at else [],
+        ifsc_codes=extract_ifsc_codes(text) if has_digit else []
+    )
+
+
+def _build_result(
+    bank_accounts: List[str],
+    upi_ids: List[str],
+    phone_numbers: List[str],
+    phishing_links: List[str],
+    emails: List[str],
+    ifsc_codes: List[str]
+) -> Dict[str, Any]:
+    """Assemble the extract_intelligence result dictionary."""
     # Check if any intelligence was found
     has_intelligence = bool(
         bank_accounts or upi_ids or phone_numbers or 
@@ -197,6 +232,209 @@ def extract_intelligence(text: str) -> Dict[str, Any]:
     }
 
 
+# ---------------------------------------------------------------------------
+# Optional Hyperscan Backend (single pass for all patterns)
+# ---------------------------------------------------------------------------
+
+# Pattern IDs in the Hyperscan database
+(_HS_BANK, _HS_UPI, _HS_PHONE, _HS_LINK,
+ _HS_EMAIL, _HS_IFSC) = range(6)
+
+
+def _build_hs_database():
+    """
+    Compile every extraction pattern into one Hyperscan database.
+    
+    Returns None when the optional hyperscan package is not installed or
+    the patterns fail to compile.
+    """
+    try:
+        import hyperscan
+    except ImportError:
+        return None
+    
+    caseless = hyperscan.HS_FLAG_CASELESS
+    patterns = [
+        (BANK_ACCOUNT_PATTERN, 0),
+        (UPI_ID_PATTERN, caseless),
+        (PHONE_PATTERN, 0),
+        (LINK_PATTERN, caseless),
+        (EMAIL_PATTERN, caseless),
+        (IFSC_PATTERN, 0),
+    ]
+    
+    try:
+        database = hyperscan.Database()
+        database.compile(
+            expressions=[pattern.encode() for pattern, _ in patterns],
+            ids=list(range(len(patterns))),
+            elements=len(patterns),
+            # Start-of-match reporting is needed to slice the matches out
+            flags=[flags | hyperscan.HS_FLAG_SOM_LEFTMOST for _, flags in patterns]
+        )
+        return database
+    except Exception as e:
+        logging.getLogger("honeypot.extractor").warning("Failed to compile Hyperscan database: %s", e)
+        return None
+
+
+# Compiled on the first extract_intelligence_hs call, so the API (which
+# never uses it) does not pay for the compile on every cold start
+_hs_database = None
+_hs_database_built = False
+
+# A database has a single scratch space, so scans must not overlap; the
+# lock also guards the one-time build
+_hs_lock = threading.Lock()
+
+
+def _get_hs_database():
+    """Return the Hyperscan database, building it on first use."""
+    global _hs_database, _hs_database_built
+    with _hs_lock:
+        if not _hs_database_built:
+            _hs_database = _build_hs_database()
+            _hs_database_built = True
+        return _hs_database
+
+
+# Deletion table for phone separators; str.translate is a single C-level
+# pass, cheaper than running the regex VM for fixed characters.
+_PHONE_STRIP = str.maketrans('', '', '+- \t\n\r\f\v')
+
+
+def _normalize_phone_numbers(matches: List[str]) -> List[str]:
+    """
+    Reduce phone matches to their 10 core digits, then deduplicate.
+    
+    Hyperscan reports whole matches (it has no capture groups), so the
+    +91/91 prefix and separators are stripped here instead.
+    """
+    normalized = []
+    for match in matches:
+        # Remove +91, 91, spaces, hyphens
+        digits = match.translate(_PHONE_STRIP)
+        if digits.startswith('91') and len(digits) > 10:
+            digits = digits[2:]
+        if len(digits) == 10:
+            normalized.append(digits)
+    
+    return list(dict.fromkeys(normalized))
+
+
+def _leftmost_longest(spans: List[Tuple[int, int]]) -> Optional[List[Tuple[int, int]]]:
+    """
+    Reduce Hyperscan match spans to the ones re.findall would return.
+    
+    Hyperscan reports every end offset at which a pattern matches, paired
+    with the leftmost possible start. For the greedy patterns above,
+    re.findall returns the longest match at the leftmost start and resumes
+    after it, so replay that selection. If a span straddles the end of a
+    selected match, the start re.findall would resume from is unknown;
+    return None so the caller can fall back to the regex.
+    """
+    longest: Dict[int, int] = {}
+    for start, end in spans:
+        if end > longest.get(start, -1):
+            longest[start] = end
+    
+    selected = []
+    last_end = 0
+    for start in sorted(longest):
+        end = longest[start]
+        if start >= last_end:
+            selected.append((start, end))
+            last_end = end
+        elif end > last_end:
+            return None
+    return selected
+
+
+def extract_intelligence_hs(text: str) -> Dict[str, Any]:
+    """
+    Hyperscan-backed variant of extract_intelligence.
+    
+    Scans the text once for all patterns instead of once per pattern, which
+    pays off on large inputs such as bulk honeypot logs. Returns the same
+    structure as extract_intelligence, and falls back to it when the
+    hyperscan package is not installed.
+    """
+    if not text or not isinstance(text, str):
+        return extract_intelligence(text)
+    
+    database = _get_hs_database()
+    if database is None:
+        return extract_intelligence(text)
+    
+    # Hyperscan works on bytes; offsets are byte offsets into `data`
+    data = text.encode("utf-8")
+    spans: List[List[Tuple[int, int]]] = [[] for _ in range(6)]
+    
+    def on_match(pattern_id, start, end, flags, context):
+        spans[pattern_id].append((start, end))
+    
+    with _hs_lock:
+        database.scan(data, match_event_handler=on_match)
+    
+    def matches(pattern_id: int, regex) -> List[str]:
+        selected = _leftmost_longest(spans[pattern_id])
+        if selected is None:
+            # Ambiguous overlap (rare) - let the regex decide
+            return regex.findall(text)
+        return [data[start:end].decode("utf-8", "ignore") for start, end in selected]
+    
+    return _build_result(
+        bank_accounts=_filter_bank_accounts(matches(_HS_BANK, _RE_BANK)),
+        upi_ids=_filter_upi_ids(matches(_HS_UPI, _RE_UPI)),
+        phone_numbers=_normalize_phone_numbers(matches(_HS_PHONE, _RE_PHONE)),
+        phishing_links=list(dict.fromkeys(matches(_HS_LINK, _RE_URL_COMBINED))),
+        emails=list(dict.fromkeys(matches(_HS_EMAIL, _RE_EMAIL))),
+        ifsc_codes=list(dict.fromkeys(matches(_HS_IFSC, _RE_IFSC)))
+    )
+
+
+# ---------------------------------------------------------------------------
+# Batch Extraction (pandas)
+# ---------------------------------------------------------------------------
+
+def extract_intelligence_batch(messages: "pd.Series") -> "pd.DataFrame":
+    """
+    Extract intelligence from a whole pandas Series of messages at once.
+    
+    Meant for offline triage of stored chat logs: each pattern runs over the
+    entire Series through the vectorized `.str.findall` accessor instead of
+    calling extract_intelligence once per row, with the same results.
+    Requires pandas, which the API itself does not need.
+    
+    Args:
+        messages: Series of message texts (non-string entries yield no matches)
+        
+    Returns:
+        DataFrame with the same index as `messages`, one list column per
+        extract_intelligence field, plus a boolean "has_intelligence" column
+    """
+    import pandas as pd
+    
+    def findall(pattern: str, ignore_case: bool = False) -> "pd.Series":
+        # pandas compiles pattern strings itself (with the same `re` module)
+        return messages.str.findall(f"(?i){pattern}" if ignore_case else pattern)
+    
+    def per_row(matches: "pd.Series", row_filter=lambda xs: list(dict.fromkeys(xs))) -> "pd.Series":
+        return matches.map(lambda xs: row_filter(xs) if isinstance(xs, list) else [])
+    
+    result = pd.DataFrame({
+        "bank_accounts": per_row(findall(BANK_ACCOUNT_PATTERN), _filter_bank_accounts),
+        "upi_ids": per_row(findall(UPI_ID_PATTERN, ignore_case=True), _filter_upi_ids),
+        "phone_numbers": per_row(findall(PHONE_PATTERN)),
+        "phishing_links": per_row(findall(LINK_PATTERN, ignore_case=True)),
+        "emails": per_row(findall(EMAIL_PATTERN, ignore_case=True)),
+        "ifsc_codes": per_row(findall(IFSC_PATTERN))
+    }, index=messages.index)
+    
+    result["has_intelligence"] = (result.apply(lambda column: column.str.len()) > 0).any(axis=1)
+    return result
+
+
 # ---------------------------------------------------------------------------
 # Module Test
 # ---------------------------------------------------------------------------
@@ -10,18 +10,24 @@ An autonomous AI agent that:
 Uses Google Gemini for intelligent conversation generation.
 """
 
-import os
-import json
 import re
-import requests
+import asyncio
+import logging
+import time
 import uuid
-from typing import Dict, Any, List, Optional
-from datetime import datetime
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional, Tuple
+from datetime import datetime, timezone
 
+import httpx
+import orjson
 from dotenv import load_dotenv
-from google import genai
+from google.genai import errors as genai_errors
+from google.genai import types
 
-from detector import detect_scam
+# Reply generation uses detector's Gemini client, so detection and reply
+# calls share one HTTP/2 connection pool
+from detector import client, detect_scam_async
 from extractor import extract_intelligence
 
 # ---------------------------------------------------------------------------
@@ -30,23 +36,33 @@ from extractor import extract_intelligence
 
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if not GEMINI_API_KEY:
-    print("[WARNING] GEMINI_API_KEY not found - using fallback responses")
-
-# Initialize Gemini client only if API key exists
-client = None
-if GEMINI_API_KEY:
-    try:
-        client = genai.Client(api_key=GEMINI_API_KEY)
-    except Exception as e:
-        print(f"[WARNING] Failed to initialize Gemini client: {e}")
+_log = logging.getLogger("honeypot")
 
 MODEL_NAME = "gemini-2.0-flash"
 
 # GUVI Callback endpoint
 GUVI_CALLBACK_URL = "https://hackathon.guvi.in/api/updateHoneyPotFinalResult"
 
+# Bounds for in-memory sessions: idle sessions expire after the TTL, and the
+# least recently used ones are dropped once the count limit is reached
+SESSION_MAX_COUNT = 10_000
+SESSION_TTL_SECONDS = 3600
+
+# Timeout for the GUVI callback POST (seconds)
+CALLBACK_TIMEOUT = 10
+
+# Connection pool for outgoing HTTP: callbacks go to a single host, so a
+# few kept-alive connections (multiplexed over HTTP/2) cover the load
+HTTP_MAX_CONNECTIONS = 20
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 10
+
+# Retries for a failed callback, doubling the delay from the initial backoff
+CALLBACK_MAX_RETRIES = 5
+CALLBACK_INITIAL_BACKOFF = 2.0
+
+# Seconds to let queued callbacks go out on shutdown
+CALLBACK_DRAIN_TIMEOUT = 5.0
+
 # Suspicious keywords for extraction
 SUSPICIOUS_KEYWORDS = [
     "urgent", "verify now", "account blocked", "KYC", "OTP", 
@@ -54,6 +70,43 @@ SUSPICIOUS_KEYWORDS = [
     "immediately", "verify", "click here", "link", "expire"
 ]
 
+# (lowercased keyword, keyword) pairs, lowered once for matching
+_SUSPICIOUS_PAIRS = tuple((keyword.lower(), keyword) for keyword in SUSPICIOUS_KEYWORDS)
+
+# Optional: pyahocorasick finds every keyword in one pass over the text
+# instead of one substring scan per keyword
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+def _build_keyword_automaton():
+    """Build an Aho-Corasick automaton over the lowercased keywords."""
+    if ahocorasick is None:
+        return None
+    
+    automaton = ahocorasick.Automaton()
+    for keyword_lower, keyword in _SUSPICIOUS_PAIRS:
+        automaton.add_word(keyword_lower, keyword)
+    automaton.make_automaton()
+    return automaton
+
+
+_KEYWORD_AUTOMATON = _build_keyword_automaton()
+
+
+def _find_suspicious_keywords(text_lower: str) -> List[str]:
+    """
+    Return the SUSPICIOUS_KEYWORDS contained in already-lowercased text.
+    
+    Overlapping keywords are all reported ("verify now" also yields
+    "verify"); a keyword may appear more than once.
+    """
+    if _KEYWORD_AUTOMATON is not None:
+        return [keyword for _, keyword in _KEYWORD_AUTOMATON.iter(text_lower)]
+    return [keyword for keyword_lower, keyword in _SUSPICIOUS_PAIRS if keyword_lower in text_lower]
+
 # ---------------------------------------------------------------------------
 # Honeypot Personas (Believable Victim Profiles)
 # ---------------------------------------------------------------------------
@@ -102,6 +155,152 @@ PERSONAS = {
 
 DEFAULT_PERSONA = "elderly_uncle"
 
+# Number of most recent messages given to the LLM as conversation context
+CONTEXT_WINDOW_MESSAGES = 15
+
+# Messages shorter than this, with no scam keywords or intelligence, in a
+# conversation not yet flagged, get a canned reply without calling Gemini
+FAST_PATH_MAX_LENGTH = 40
+
+
+def _build_prompt_prefix(persona: Dict[str, Any]) -> str:
+    """Build the static reply instructions (character profile and goals)."""
+    return f"""You are playing the role of a potential scam victim to safely engage a scammer and extract information.
+
+CHARACTER PROFILE:
+- Name: {persona['name']}
+- Age: {persona['age']}
+- Occupation: {persona['occupation']}
+- Personality: {', '.join(persona['characteristics'])}
+- Speaking style: {persona['style']}
+
+YOUR GOAL:
+1. Stay in character as a believable potential victim
+2. Show interest but ask clarifying questions
+3. Try to get the scammer to reveal:
+   - Bank account numbers
+   - UPI IDs (like xyz@paytm, abc@upi)
+   - Phone numbers
+   - Payment links or websites
+4. Never actually send money or real personal info
+5. Keep responses short (1-3 sentences)
+6. Sound like a real Indian person - use Hindi-English mix naturally"""
+
+
+# Only the conversation and latest message change per turn, so the
+# persona part of the prompt is built once per persona at import and sent
+# as the system instruction (or through a context cache, see below)
+_PERSONA_PROMPT_PREFIXES = {
+    key: _build_prompt_prefix(persona) for key, persona in PERSONAS.items()
+}
+
+
+# ---------------------------------------------------------------------------
+# Gemini Context Cache (persona prompt prefix)
+# ---------------------------------------------------------------------------
+
+# Lifetime of a persona's context cache; it is recreated once expired
+PERSONA_CACHE_TTL_SECONDS = 1800
+
+# Smallest prompt Gemini accepts for an explicit context cache on MODEL_NAME.
+# Shorter prefixes are sent as a plain system instruction instead.
+CONTEXT_CACHE_MIN_TOKENS = 4096
+
+# Rough characters per token for English prompt text, used to size the
+# static prefixes without a count_tokens round trip
+_CHARS_PER_TOKEN = 4
+
+# Decided once at import: the prefixes never change, and today they are all
+# a few hundred tokens, far below the minimum, so no cache is ever created
+_PERSONA_CACHEABLE = {
+    key: len(prefix) // _CHARS_PER_TOKEN >= CONTEXT_CACHE_MIN_TOKENS
+    for key, prefix in _PERSONA_PROMPT_PREFIXES.items()
+}
+
+# Persona key -> (cached content name or None, monotonic expiry time).
+# The prefix is identical for every session of a persona, so one cache is
+# shared by all of them. A failed create is remembered as None until the
+# expiry too, so it is not retried on every turn.
+_persona_caches: Dict[str, Tuple[Optional[str], float]] = {}
+
+# One lock per persona, taken only to refresh its entry, so a slow
+# caches.create never holds up turns of other personas or cache hits
+_persona_cache_locks: Dict[str, asyncio.Lock] = {key: asyncio.Lock() for key in PERSONAS}
+
+
+async def _get_persona_cache(persona_key: str) -> Optional[str]:
+    """
+    Return the context cache name holding a persona's prompt prefix.
+    
+    Returns None when caching is unavailable (e.g. the prefix is below the
+    model's minimum cacheable size); callers then send the prefix as a
+    plain system instruction.
+    """
+    if not _PERSONA_CACHEABLE[persona_key]:
+        return None
+    
+    name, expires_at = _persona_caches.get(persona_key, (None, 0.0))
+    if time.monotonic() < expires_at:
+        return name
+    
+    async with _persona_cache_locks[persona_key]:
+        # Another turn may have refreshed the entry while we waited
+        old_name, expires_at = _persona_caches.get(persona_key, (None, 0.0))
+        if time.monotonic() < expires_at:
+            return old_name
+        
+        try:
+            cache = await client.aio.caches.create(
+                model=MODEL_NAME,
+                config=types.CreateCachedContentConfig(
+                    display_name=f"honeypot-persona-{persona_key}",
+                    system_instruction=_PERSONA_PROMPT_PREFIXES[persona_key],
+                    ttl=f"{PERSONA_CACHE_TTL_SECONDS}s"
+                )
+            )
+            name = cache.name
+        except Exception as e:
+            _log.warning("Context cache unavailable for persona %s: %s", persona_key, e)
+            name = None
+        
+        # Renew slightly before the server-side TTL runs out
+        _persona_caches[persona_key] = (name, time.monotonic() + PERSONA_CACHE_TTL_SECONDS - 60)
+    
+    if old_name:
+        await _delete_cache(old_name)
+    return name
+
+
+def _is_invalid_cache_error(error: Exception) -> bool:
+    """True if a Gemini call failed because its cached content is gone or unusable."""
+    if not isinstance(error, genai_errors.APIError):
+        return False
+    return error.code == 404 or (
+        error.code in (400, 403) and "cache" in (error.message or "").lower()
+    )
+
+
+async def _forget_persona_cache(persona_key: str, name: str, error: Exception) -> None:
+    """
+    Drop a persona's cache entry after `error` so the next call creates a
+    new one, deleting the old cache unless it no longer exists.
+    """
+    current, _ = _persona_caches.get(persona_key, (None, 0.0))
+    if current != name:
+        # Already replaced by another turn
+        return
+    _persona_caches.pop(persona_key, None)
+    if error.code != 404:
+        await _delete_cache(name)
+
+
+async def _delete_cache(name: str) -> None:
+    """Delete a server-side context cache so it stops billing storage."""
+    try:
+        await client.aio.caches.delete(name=name)
+    except Exception as e:
+        _log.warning("Failed to delete context cache %s: %s", name, e)
+
 
 # ---------------------------------------------------------------------------
 # Conversation State Management
@@ -112,127 +311,184 @@ class ConversationState:
     
     def __init__(self, session_id: str, persona: str = DEFAULT_PERSONA):
         self.session_id = session_id
-        self.persona = PERSONAS.get(persona, PERSONAS[DEFAULT_PERSONA])
+        self.persona_key = persona if persona in PERSONAS else DEFAULT_PERSONA
+        self.persona = PERSONAS[self.persona_key]
         self.messages: List[Dict[str, Any]] = []
-        self.extracted_intelligence: Dict[str, List] = {
-            "bankAccounts": [],
-            "upiIds": [],
-            "phoneNumbers": [],
-            "phishingLinks": [],
-            "suspiciousKeywords": []
+        # "Role: content" lines of the latest messages, formatted once as
+        # they are added, for get_full_conversation_context
+        self._context_lines: deque = deque(maxlen=CONTEXT_WINDOW_MESSAGES)
+        # Insertion-ordered sets (dict keys) for O(1) deduplication;
+        # exposed as lists through the extracted_intelligence property
+        self._intel: Dict[str, Dict[str, None]] = {
+            "bankAccounts": {},
+            "upiIds": {},
+            "phoneNumbers": {},
+            "phishingLinks": {},
+            "suspiciousKeywords": {}
         }
         self.scam_detected = False
         self.scam_type = None
-        self.created_at = datetime.utcnow().isoformat()
+        self.created_at = datetime.now(timezone.utc).isoformat()
         self.turn_count = 0
         self.callback_sent = False
         self.agent_notes = ""
+        self.last_active = time.monotonic()
+        # Serializes turns of this session; see process_scam_message
+        self._lock = asyncio.Lock()
+        # (message, timestamp, history length) of the last timestamped turn
+        # and its reply, so a retried request gets the same reply without
+        # redoing the turn
+        self._last_turn: Optional[Tuple[Tuple[str, int, int], str]] = None
+    
+    @property
+    def extracted_intelligence(self) -> Dict[str, List[str]]:
+        """Extracted intelligence as lists, in the GUVI callback format."""
+        return {key: list(values) for key, values in self._intel.items()}
     
     def rebuild_from_history(self, conversation_history: List[Dict]):
-        """Rebuild session state from conversationHistory (for Cloud Run resilience)."""
-        self.messages = []
-        for msg in conversation_history:
-            sender = msg.get("sender", "unknown")
-            text = msg.get("text", "")
-            timestamp = msg.get("timestamp", 0)
-            
-            self.messages.append({
-                "role": sender,
-                "content": text,
-                "timestamp": timestamp
-            })
-            
-            # Extract intelligence from historical messages
-            if sender == "scammer":
-                self._extract_and_merge(text)
+        """
+        Rebuild session state from conversationHistory (for Cloud Run resilience).
+        
+        The client resends the whole conversation every turn. When the
+        messages already held are a prefix of it, only the new tail is
+        processed; otherwise the history is replayed from the start.
+        """
+        # Raw API items; defaults match the request model in main.py
+        def sender_of(msg: Dict) -> str:
+            return msg.get("sender") or "scammer"
+        
+        def text_of(msg: Dict) -> str:
+            return msg.get("text") or ""
+        
+        known = len(self.messages)
+        is_prefix = 0 < known <= len(conversation_history) and all(
+            message["role"] == sender_of(msg) and message["content"] == text_of(msg)
+            for message, msg in zip(self.messages, conversation_history)
+        )
+        if is_prefix:
+            new_messages = conversation_history[known:]
+        else:
+            self.messages = []
+            self._context_lines.clear()
+            new_messages = conversation_history
+        
+        records = [
+            {
+                "role": sender_of(msg),
+                "content": text_of(msg),
+                "timestamp": msg.get("timestamp", 0)
+            }
+            for msg in new_messages
+        ]
+        
+        self.messages.extend(records)
+        self._context_lines.extend(
+            self._context_line(record["role"], record["content"])
+            for record in records[-CONTEXT_WINDOW_MESSAGES:]
+        )
+        
+        # Extract intelligence from historical scammer messages
+        for record in records:
+            if record["role"] == "scammer":
+                self._extract_and_merge(record["content"])
         
         self.turn_count = len(self.messages)
     
     def add_message(self, role: str, content: str, timestamp: int = None):
         """Add a message to conversation history."""
-        self.messages.append({
-            "role": role,
-            "content": content,
-            "timestamp": timestamp or int(datetime.utcnow().timestamp() * 1000)
-        })
+        self._append(role, content, timestamp or time.time_ns() // 1_000_000)
         self.turn_count += 1
         
         # Extract intelligence from scammer messages
         if role == "scammer":
             self._extract_and_merge(content)
     
+    def _append(self, role: str, content: str, timestamp: int):
+        """Store a message and its formatted context line."""
+        self.messages.append({
+            "role": role,
+            "content": content,
+            "timestamp": timestamp
+        })
+        self._context_lines.append(self._context_line(role, content))
+    
+    @staticmethod
+    def _context_line(role: str, content: str) -> str:
+        """Format a message as a "Speaker: content" context line."""
+        speaker = "Scammer" if role == "scammer" else "You"
+        return f"{speaker}: {content}"
+    
     def _extract_and_merge(self, text: str):
         """Extract and merge intelligence from text."""
         intel = extract_intelligence(text)
         
         # Merge bank accounts
-        for acc in intel.get("bank_accounts", []):
-            if acc not in self.extracted_intelligence["bankAccounts"]:
-                self.extracted_intelligence["bankAccounts"].append(acc)
+        self._intel["bankAccounts"].update(dict.fromkeys(intel.get("bank_accounts", [])))
         
         # Merge UPI IDs
-        for upi in intel.get("upi_ids", []):
-            if upi not in self.extracted_intelligence["upiIds"]:
-                self.extracted_intelligence["upiIds"].append(upi)
+        self._intel["upiIds"].update(dict.fromkeys(intel.get("upi_ids", [])))
         
         # Merge phone numbers
-        for phone in intel.get("phone_numbers", []):
-            if phone not in self.extracted_intelligence["phoneNumbers"]:
-                self.extracted_intelligence["phoneNumbers"].append(phone)
+        self._intel["phoneNumbers"].update(dict.fromkeys(intel.get("phone_numbers", [])))
         
         # Merge phishing links
-        for link in intel.get("phishing_links", []):
-            if link not in self.extracted_intelligence["phishingLinks"]:
-                self.extracted_intelligence["phishingLinks"].append(link)
+        self._intel["phishingLinks"].update(dict.fromkeys(intel.get("phishing_links", [])))
         
         # Extract suspicious keywords
-        text_lower = text.lower()
-        for keyword in SUSPICIOUS_KEYWORDS:
-            if keyword.lower() in text_lower:
-                if keyword not in self.extracted_intelligence["suspiciousKeywords"]:
-                    self.extracted_intelligence["suspiciousKeywords"].append(keyword)
+        self._intel["suspiciousKeywords"].update(
+            dict.fromkeys(_find_suspicious_keywords(text.lower()))
+        )
     
     def has_valuable_intelligence(self) -> bool:
         """Check if we've extracted valuable intelligence worth reporting."""
-        return (
-            len(self.extracted_intelligence["bankAccounts"]) > 0 or
-            len(self.extracted_intelligence["upiIds"]) > 0 or
-            len(self.extracted_intelligence["phishingLinks"]) > 0 or
-            len(self.extracted_intelligence["phoneNumbers"]) > 0
+        return bool(
+            self._intel["bankAccounts"] or
+            self._intel["upiIds"] or
+            self._intel["phishingLinks"] or
+            self._intel["phoneNumbers"]
         )
     
     def get_full_conversation_context(self) -> str:
         """Get formatted conversation history for LLM with full context."""
-        if not self.messages:
-            return "No previous conversation."
-        
-        context = []
-        for msg in self.messages[-15:]:  # Last 15 messages for context
-            role = "Scammer" if msg["role"] == "scammer" else "You"
-            context.append(f"{role}: {msg['content']}")
-        return "\n".join(context)
+        # Last CONTEXT_WINDOW_MESSAGES messages, already formatted
+        return "\n".join(self._context_lines) or "No previous conversation."
     
     def generate_agent_notes(self) -> str:
         """Generate summary notes about the scammer's behavior."""
         notes = []
         
-        if self.extracted_intelligence["suspiciousKeywords"]:
-            notes.append(f"Used urgency tactics: {', '.join(self.extracted_intelligence['suspiciousKeywords'][:5])}")
+        if self._intel["suspiciousKeywords"]:
+            keywords = list(self._intel["suspiciousKeywords"])[:5]
+            notes.append(f"Used urgency tactics: {', '.join(keywords)}")
         
-        if self.extracted_intelligence["upiIds"]:
+        if self._intel["upiIds"]:
             notes.append("Requested UPI payment")
         
-        if self.extracted_intelligence["bankAccounts"]:
+        if self._intel["bankAccounts"]:
             notes.append("Provided bank account details")
         
-        if self.extracted_intelligence["phishingLinks"]:
+        if self._intel["phishingLinks"]:
             notes.append("Shared suspicious links")
         
         return ". ".join(notes) if notes else "Scam conversation detected"
 
 
-# In-memory session storage
-_sessions: Dict[str, ConversationState] = {}
+# In-memory session storage, least recently used first. Only touched from
+# the event loop without awaiting in between, so no lock is needed.
+_sessions: "OrderedDict[str, ConversationState]" = OrderedDict()
+
+
+def _evict_sessions(now: float) -> None:
+    """Drop expired sessions and make room for one more below the limit."""
+    while _sessions:
+        session = next(iter(_sessions.values()))
+        if len(_sessions) < SESSION_MAX_COUNT and now - session.last_active < SESSION_TTL_SECONDS:
+            break
+        
+        del _sessions[session.session_id]
+        # Report a detected scam that never got its callback before it is lost
+        if session.scam_detected and not session.callback_sent:
+            enqueue_guvi_callback(session)
 
 
 def get_or_create_session(
@@ -244,10 +500,15 @@ def get_or_create_session(
     Get existing session or create new one.
     If conversationHistory is provided, rebuild state from it (Cloud Run resilience).
     """
-    if session_id not in _sessions:
-        _sessions[session_id] = ConversationState(session_id, persona)
+    now = time.monotonic()
+    _evict_sessions(now)
     
-    session = _sessions[session_id]
+    session = _sessions.get(session_id)
+    if session is None:
+        session = _sessions[session_id] = ConversationState(session_id, persona)
+    else:
+        _sessions.move_to_end(session_id)
+    session.last_active = now
     
     # Rebuild from history if provided and session is fresh
     if conversation_history and len(conversation_history) > len(session.messages):
@@ -256,11 +517,48 @@ def get_or_create_session(
     return session
 
 
+# ---------------------------------------------------------------------------
+# Shared HTTP Client
+# ---------------------------------------------------------------------------
+
+# One pooled async client for outgoing HTTP (GUVI callbacks). Opened and
+# closed by the FastAPI lifespan; created lazily when used without it.
+_http: Optional[httpx.AsyncClient] = None
+
+
+def _get_http_client() -> httpx.AsyncClient:
+    """Return the shared async HTTP client, creating it if needed."""
+    global _http
+    if _http is None or _http.is_closed:
+        _http = httpx.AsyncClient(
+            timeout=CALLBACK_TIMEOUT,
+            http2=True,
+            limits=httpx.Limits(
+                max_connections=HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS
+            )
+        )
+    return _http
+
+
+async def open_http_client() -> None:
+    """Create the shared HTTP client (call on application startup)."""
+    _get_http_client()
+
+
+async def close_http_client() -> None:
+    """Close the shared HTTP client (call on application shutdown)."""
+    global _http
+    if _http is not None:
+        await _http.aclose()
+        _http = None
+
+
 # ---------------------------------------------------------------------------
 # GUVI Callback Function (MANDATORY)
 # ---------------------------------------------------------------------------
 
-def send_guvi_callback(session: ConversationState) -> bool:
+async def send_guvi_callback(session: ConversationState) -> bool:
     """
     Send final results to GUVI evaluation endpoint.
     This is MANDATORY for scoring.
@@ -268,7 +566,7 @@ def send_guvi_callback(session: ConversationState) -> bool:
     Returns True if callback was successful.
     """
     if session.callback_sent:
-        print(f"[INFO] Callback already sent for session {session.session_id}")
+        _log.info("Callback already sent for session %s", session.session_id)
         return True
     
     payload = {
@@ -279,35 +577,112 @@ def send_guvi_callback(session: ConversationState) -> bool:
         "agentNotes": session.generate_agent_notes()
     }
     
-    print(f"[CALLBACK] Sending to GUVI: {json.dumps(payload, indent=2)}")
+    body = orjson.dumps(payload)
+    if _log.isEnabledFor(logging.DEBUG):
+        _log.debug("Sending GUVI callback: %s", body.decode())
     
     try:
-        response = requests.post(
+        response = await _get_http_client().post(
             GUVI_CALLBACK_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=10
+            content=body,
+            headers={"Content-Type": "application/json"}
         )
         
-        print(f"[CALLBACK] Response: {response.status_code} - {response.text}")
-        
         if response.status_code == 200:
+            _log.info("GUVI callback sent for session %s", session.session_id)
             session.callback_sent = True
             return True
         else:
-            print(f"[CALLBACK ERROR] Status {response.status_code}: {response.text}")
+            _log.error("GUVI callback for session %s failed with status %s: %s",
+                       session.session_id, response.status_code, response.text)
             return False
             
     except Exception as e:
-        print(f"[CALLBACK ERROR] Failed to send callback: {e}")
+        _log.error("Failed to send GUVI callback for session %s: %s", session.session_id, e)
         return False
 
 
+# ---------------------------------------------------------------------------
+# GUVI Callback Queue
+# ---------------------------------------------------------------------------
+
+# Callbacks are sent by one background worker so replies never wait on
+# GUVI, and a failing endpoint is retried with backoff instead of on every
+# turn. The payload is built when the POST is made, so a retry reports the
+# latest intelligence.
+_callback_queue: Optional[asyncio.Queue] = None
+_callback_worker: Optional[asyncio.Task] = None
+
+# Sessions with a callback queued, in flight or waiting to be retried
+_pending_callbacks: set = set()
+
+
+async def _run_callback_worker(queue: asyncio.Queue) -> None:
+    """Send queued callbacks; reschedule failures with exponential backoff."""
+    loop = asyncio.get_running_loop()
+    while True:
+        session, attempt = await queue.get()
+        try:
+            if await send_guvi_callback(session):
+                _pending_callbacks.discard(session.session_id)
+            elif attempt >= CALLBACK_MAX_RETRIES:
+                _log.error("Giving up on GUVI callback for session %s after %d retries",
+                           session.session_id, attempt)
+                _pending_callbacks.discard(session.session_id)
+            else:
+                backoff = CALLBACK_INITIAL_BACKOFF * 2 ** attempt
+                loop.call_later(backoff, queue.put_nowait, (session, attempt + 1))
+        finally:
+            queue.task_done()
+
+
+def _ensure_callback_worker() -> asyncio.Queue:
+    """Start the callback worker on the running loop if it is not running."""
+    global _callback_queue, _callback_worker
+    if _callback_worker is None or _callback_worker.done():
+        _callback_queue = asyncio.Queue()
+        _callback_worker = asyncio.create_task(_run_callback_worker(_callback_queue))
+    return _callback_queue
+
+
+def enqueue_guvi_callback(session: ConversationState) -> None:
+    """Queue a GUVI callback; no-op if sent already or one is pending."""
+    if session.callback_sent or session.session_id in _pending_callbacks:
+        return
+    _pending_callbacks.add(session.session_id)
+    _ensure_callback_worker().put_nowait((session, 0))
+
+
+async def start_callback_worker() -> None:
+    """Start the callback worker (call on application startup)."""
+    _ensure_callback_worker()
+
+
+async def stop_callback_worker() -> None:
+    """Let queued callbacks go out, then stop the worker (call on shutdown)."""
+    global _callback_worker
+    if _callback_worker is None:
+        return
+    
+    try:
+        await asyncio.wait_for(_callback_queue.join(), CALLBACK_DRAIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        _log.warning("Shutting down with GUVI callbacks still queued")
+    
+    _callback_worker.cancel()
+    try:
+        await _callback_worker
+    except asyncio.CancelledError:
+        pass
+    _callback_worker = None
+    _pending_callbacks.clear()
+
+
 # ---------------------------------------------------------------------------
 # Response Generation with Full Context
 # ---------------------------------------------------------------------------
 
-def generate_contextual_response(session: ConversationState, latest_message: str) -> str:
+async def generate_contextual_response(session: ConversationState, latest_message: str) -> str:
     """Generate response using Gemini with full conversation context."""
     
     if not client:
@@ -316,28 +691,9 @@ def generate_contextual_response(session: ConversationState, latest_message: str
     persona = session.persona
     full_context = session.get_full_conversation_context()
     
-    prompt = f"""You are playing the role of a potential scam victim to safely engage a scammer and extract information.
-
-CHARACTER PROFILE:
-- Name: {persona['name']}
-- Age: {persona['age']}
-- Occupation: {persona['occupation']}
-- Personality: {', '.join(persona['characteristics'])}
-- Speaking style: {persona['style']}
-
-YOUR GOAL:
-1. Stay in character as a believable potential victim
-2. Show interest but ask clarifying questions
-3. Try to get the scammer to reveal:
-   - Bank account numbers
-   - UPI IDs (like xyz@paytm, abc@upi)
-   - Phone numbers
-   - Payment links or websites
-4. Never actually send money or real personal info
-5. Keep responses short (1-3 sentences)
-6. Sound like a real Indian person - use Hindi-English mix naturally
-
-FULL CONVERSATION HISTORY:
+    # Only the per-turn tail is sent as contents; the persona prefix comes
+    # from the context cache, or from the system instruction without one
+    prompt = f"""FULL CONVERSATION HISTORY:
 {full_context}
 
 LATEST MESSAGE FROM SCAMMER:
@@ -347,14 +703,27 @@ Generate your next response as {persona['name']}. Stay in character. Be curious
 
 RESPOND WITH ONLY THE MESSAGE TEXT (no quotes, no "Response:", just the message):"""
 
+    cache_name = await _get_persona_cache(session.persona_key)
+    if cache_name:
+        config = types.GenerateContentConfig(cached_content=cache_name)
+    else:
+        config = types.GenerateContentConfig(
+            system_instruction=_PERSONA_PROMPT_PREFIXES[session.persona_key]
+        )
+    
     try:
-        response = client.models.generate_content(
+        response = await client.aio.models.generate_content(
             model=MODEL_NAME,
-            contents=prompt
+            contents=prompt,
+            config=config
         )
         return response.text.strip()
     except Exception as e:
-        print(f"[ERROR] Gemini API failed: {e}")
+        _log.error("Gemini API failed: %s", e)
+        if cache_name and _is_invalid_cache_error(e):
+            # The cache was evicted early or is unusable; recreate it next
+            # turn. Other errors (429s, timeouts) leave it in place.
+            await _forget_persona_cache(session.persona_key, cache_name, e)
         return _get_fallback_response(session)
 
 
@@ -380,12 +749,13 @@ def _get_fallback_response(session: ConversationState) -> str:
 # Main Processing Function (Called by FastAPI)
 # ---------------------------------------------------------------------------
 
-def process_scam_message(
+async def process_scam_message(
     message: str,
     session_id: str,
     conversation_history: List[Dict] = None,
     metadata: Dict = None,
-    persona: str = DEFAULT_PERSONA
+    persona: str = DEFAULT_PERSONA,
+    timestamp: Optional[int] = None
 ) -> Dict[str, Any]:
     """
     Main entry point for processing a scam message.
@@ -396,37 +766,66 @@ def process_scam_message(
         conversation_history: Previous messages in conversation
         metadata: Channel, language, locale info
         persona: Which victim persona to use
+        timestamp: Message timestamp in ms, if the client sent one
         
     Returns:
         {"status": "success", "reply": "..."} or {"status": "error", "message": "..."}
     """
     try:
-        # Get or create session with history rebuild
-        session = get_or_create_session(
-            session_id=session_id,
-            persona=persona,
-            conversation_history=conversation_history or []
-        )
+        conversation_history = conversation_history or []
+        session = get_or_create_session(session_id=session_id, persona=persona)
         
-        # Add the current message to session
-        session.add_message("scammer", message)
-        
-        # Detect scam on first turn or if not yet detected
-        if not session.scam_detected:
-            scam_result = detect_scam(message)
-            session.scam_detected = scam_result.get("is_scam", False)
-            session.scam_type = scam_result.get("reason", "Unknown")
-        
-        # Generate contextual response
-        reply = generate_contextual_response(session, message)
-        
-        # Add our response to history
-        session.add_message("user", reply)
-        
-        # Check if we should send the GUVI callback
-        # Trigger: scam detected AND valuable intelligence extracted
-        if session.scam_detected and session.has_valuable_intelligence():
-            send_guvi_callback(session)
+        # One turn per session at a time: concurrent requests for the same
+        # sessionId (client retries) would otherwise both rebuild, append
+        # and call Gemini
+        async with session._lock:
+            # Only a timestamp tells a retry apart from the scammer sending
+            # the same text again, so untimestamped turns are never deduped
+            turn_key = None
+            if timestamp is not None:
+                turn_key = (message, timestamp, len(conversation_history))
+            if turn_key and session._last_turn and session._last_turn[0] == turn_key:
+                # Retry of the turn just answered
+                return {
+                    "status": "success",
+                    "reply": session._last_turn[1]
+                }
+            
+            # Rebuild from history if it holds messages we have not seen
+            if len(conversation_history) > len(session.messages):
+                session.rebuild_from_history(conversation_history)
+            
+            # Add the current message to session
+            session.add_message("scammer", message, timestamp)
+            
+            if (
+                not session.scam_detected
+                and len(message) < FAST_PATH_MAX_LENGTH
+                and not session.has_valuable_intelligence()
+                and not _find_suspicious_keywords(message.lower())
+            ):
+                # Fast path: nothing to classify or engage with yet, so skip
+                # both Gemini calls; detection runs again on the next turn
+                reply = _get_fallback_response(session)
+            else:
+                # Detect scam on first turn or if not yet detected
+                if not session.scam_detected:
+                    scam_result = await detect_scam_async(message)
+                    session.scam_detected = scam_result.get("is_scam", False)
+                    session.scam_type = scam_result.get("reason", "Unknown")
+                
+                # Generate contextual response
+                reply = await generate_contextual_response(session, message)
+            
+            # Add our response to history
+            session.add_message("user", reply)
+            session._last_turn = (turn_key, reply) if turn_key else None
+            
+            # Check if we should send the GUVI callback
+            # Trigger: scam detected AND valuable intelligence extracted
+            # (queued, so the reply is not held up by GUVI)
+            if session.scam_detected and session.has_valuable_intelligence():
+                enqueue_guvi_callback(session)
         
         # Return in strict schema format
         return {
@@ -435,7 +834,7 @@ def process_scam_message(
         }
         
     except Exception as e:
-        print(f"[ERROR] process_scam_message failed: {e}")
+        _log.exception("process_scam_message failed")
         return {
             "status": "error",
             "message": str(e)
@@ -459,22 +858,30 @@ if __name__ == "__main__":
     ]
     
     session_id = "test-session-001"
-    history = []
     
-    for i, msg in enumerate(test_messages, 1):
-        print(f"\n--- Turn {i} ---")
-        print(f"Scammer: {msg}")
-        
-        result = process_scam_message(
-            message=msg,
-            session_id=session_id,
-            conversation_history=history,
-            persona="elderly_uncle"
-        )
+    async def run_conversation():
+        history = []
         
-        print(f"Response: {result}")
+        for i, msg in enumerate(test_messages, 1):
+            print(f"\n--- Turn {i} ---")
+            print(f"Scammer: {msg}")
+            
+            result = await process_scam_message(
+                message=msg,
+                session_id=session_id,
+                conversation_history=history,
+                persona="elderly_uncle"
+            )
+            
+            print(f"Response: {result}")
+            
+            # Build history for next turn
+            history.append({"sender": "scammer", "text": msg, "timestamp": 123456})
+            if result.get("status") == "success":
+                history.append({"sender": "user", "text": result["reply"], "timestamp": 123457})
         
-        # Build history for next turn
-        history.append({"sender": "scammer", "text": msg, "timestamp": 123456})
-        if result.get("status") == "success":
-            history.append({"sender": "user", "text": result["reply"], "timestamp": 123457})
+        # Let queued callbacks go out before the loop closes
+        await stop_callback_worker()
+        await close_http_client()
+    
+    asyncio.run(run_conversation())
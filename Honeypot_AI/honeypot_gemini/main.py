@@ -12,16 +12,25 @@ STRICT Schema Compliance:
 """
 
 import os
-from datetime import datetime
-from typing import Optional, List, Dict, Any
+import logging
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Tuple
 
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
+import orjson
 from dotenv import load_dotenv
 
-from honeypot import process_scam_message
+from honeypot import (
+    process_scam_message,
+    open_http_client,
+    close_http_client,
+    start_callback_worker,
+    stop_callback_worker,
+)
 
 # ---------------------------------------------------------------------------
 # Load Environment Variables
@@ -30,6 +39,31 @@ load_dotenv()
 
 API_KEY = os.getenv("API_KEY", "hackathon-honeypot-api-key-2026")
 
+# DEBUG=1 enables per-request logging and the /debug/echo endpoint
+DEBUG = os.getenv("DEBUG") == "1"
+
+# ---------------------------------------------------------------------------
+# Logging
+# ---------------------------------------------------------------------------
+
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO").upper(),
+    format="%(asctime)s %(levelname)s %(name)s: %(message)s"
+)
+
+_log = logging.getLogger("honeypot.api")
+
+# ---------------------------------------------------------------------------
+# JSON Encoding
+# ---------------------------------------------------------------------------
+
+class OrjsonResponse(JSONResponse):
+    """JSONResponse encoded with orjson (several times faster than json)."""
+    
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content)
+
+
 # ---------------------------------------------------------------------------
 # Pydantic Models - STRICT GUVI FORMAT
 # ---------------------------------------------------------------------------
@@ -86,16 +120,106 @@ class ErrorResponse(BaseModel):
     message: str = Field(..., description="Error description")
 
 
+def _inline_schema(model: type) -> Dict[str, Any]:
+    """JSON schema of a model with nested $defs references inlined."""
+    schema = model.model_json_schema()
+    definitions = schema.pop("$defs", {})
+    
+    def resolve(node: Any) -> Any:
+        if isinstance(node, dict):
+            if "$ref" in node:
+                return resolve(definitions[node["$ref"].rsplit("/", 1)[-1]])
+            return {key: resolve(value) for key, value in node.items()}
+        if isinstance(node, list):
+            return [resolve(value) for value in node]
+        return node
+    
+    return resolve(schema)
+
+
+# AnalyzeRequest documents the body in OpenAPI; the endpoints read the raw
+# JSON instead of validating it into models (see _parse_analyze_request)
+ANALYZE_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {"application/json": {"schema": _inline_schema(AnalyzeRequest)}}
+    }
+}
+
+
+def _parse_analyze_request(
+    raw: Any
+) -> Tuple[str, str, Optional[int], List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Pull sessionId, message text and timestamp, history and metadata out of
+    the raw body.
+    
+    Only the fields that are used get checked; history items are type-checked
+    and passed on as-is instead of being built into Pydantic models and back
+    into dicts.
+    
+    Raises:
+        HTTPException: 400 if a required field is missing or has a wrong type
+    """
+    if not isinstance(raw, dict):
+        raise HTTPException(status_code=400, detail="Invalid request format")
+    
+    session_id = raw.get("sessionId")
+    message = raw.get("message")
+    text = message.get("text") if isinstance(message, dict) else None
+    if not isinstance(session_id, str) or not isinstance(text, str):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid request format: sessionId and message.text are required"
+        )
+    
+    timestamp = message.get("timestamp")
+    if not isinstance(timestamp, int):
+        timestamp = None
+    
+    history = raw.get("conversationHistory") or []
+    metadata = raw.get("metadata") or {}
+    if not isinstance(history, list) or not isinstance(metadata, dict):
+        raise HTTPException(status_code=400, detail="Invalid request format")
+    
+    # Same rules as ConversationHistoryItem: sender and text are optional
+    # strings (null falls back to the defaults in rebuild_from_history)
+    for item in history:
+        if (
+            not isinstance(item, dict)
+            or not isinstance(item.get("sender"), (str, type(None)))
+            or not isinstance(item.get("text"), (str, type(None)))
+        ):
+            raise HTTPException(
+                status_code=400,
+                detail="Invalid request format: conversationHistory items need string sender and text"
+            )
+    
+    return session_id, text, timestamp, history, metadata
+
+
 # ---------------------------------------------------------------------------
 # FastAPI Application
 # ---------------------------------------------------------------------------
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Run the shared HTTP client and the GUVI callback worker for the app's lifetime."""
+    await open_http_client()
+    await start_callback_worker()
+    yield
+    await stop_callback_worker()
+    await close_http_client()
+
+
 app = FastAPI(
     title="Agentic Honeypot for Scam Detection",
     description="AI-powered honeypot that engages scammers and extracts intelligence. Built for GUVI x HCL AI Impact Summit Hackathon.",
     version="2.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan,
+    default_response_class=OrjsonResponse
 )
 
 # CORS for browser-based testing
@@ -115,8 +239,8 @@ app.add_middleware(
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Ensure all errors return proper schema."""
-    print(f"[GLOBAL ERROR] {type(exc).__name__}: {exc}")
-    return JSONResponse(
+    _log.error("Unhandled %s: %s", type(exc).__name__, exc, exc_info=exc)
+    return OrjsonResponse(
         status_code=200,  # Return 200 even on errors per some tester requirements
         content={
             "status": "error",
@@ -128,7 +252,7 @@ async def global_exception_handler(request: Request, exc: Exception):
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
     """Handle HTTP exceptions with proper schema."""
-    return JSONResponse(
+    return OrjsonResponse(
         status_code=exc.status_code,
         content={
             "status": "error",
@@ -148,7 +272,7 @@ async def health_check():
         "status": "healthy",
         "service": "honeypot-api",
         "version": "2.0.0",
-        "timestamp": datetime.utcnow().isoformat()
+        "timestamp": datetime.now(timezone.utc).isoformat()
     }
 
 
@@ -196,9 +320,10 @@ async def root():
                 }
             }
         }
-    }
+    },
+    openapi_extra=ANALYZE_REQUEST_BODY
 )
-async def analyze_message(request: AnalyzeRequest):
+async def analyze_message(request: Request):
     """
     Main honeypot endpoint that receives scam messages and generates responses.
     
@@ -233,33 +358,28 @@ async def analyze_message(request: AnalyzeRequest):
     ```
     """
     try:
-        # Log incoming request for debugging
-        print(f"[REQUEST] sessionId={request.sessionId}")
-        print(f"[REQUEST] message.text={request.message.text[:100]}...")
-        print(f"[REQUEST] history_length={len(request.conversationHistory or [])}")
-        
-        # Convert Pydantic history to dict list
-        history_dicts = []
-        if request.conversationHistory:
-            for item in request.conversationHistory:
-                history_dicts.append({
-                    "sender": item.sender,
-                    "text": item.text,
-                    "timestamp": item.timestamp
-                })
-        
-        # Convert metadata to dict
-        metadata_dict = request.metadata if request.metadata else {}
+        raw = orjson.loads(await request.body())
+    except orjson.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid request format: body is not valid JSON")
+    
+    session_id, text, timestamp, history, metadata = _parse_analyze_request(raw)
+    
+    try:
+        if DEBUG:
+            _log.info("Request sessionId=%s history_length=%d message.text=%.100s...",
+                      session_id, len(history), text)
         
         # Process the message through honeypot
-        result = process_scam_message(
-            message=request.message.text,
-            session_id=request.sessionId,
-            conversation_history=history_dicts,
-            metadata=metadata_dict
+        result = await process_scam_message(
+            message=text,
+            session_id=session_id,
+            conversation_history=history,
+            metadata=metadata,
+            timestamp=timestamp
         )
         
-        print(f"[RESPONSE] {result}")
+        if DEBUG:
+            _log.info("Response %s", result)
         
         # Check result status
         if result.get("status") == "success":
@@ -269,7 +389,7 @@ async def analyze_message(request: AnalyzeRequest):
             )
         else:
             # Return error in proper format
-            return JSONResponse(
+            return OrjsonResponse(
                 status_code=200,
                 content={
                     "status": "error",
@@ -278,8 +398,8 @@ async def analyze_message(request: AnalyzeRequest):
             )
             
     except Exception as e:
-        print(f"[ERROR] analyze_message: {type(e).__name__}: {e}")
-        return JSONResponse(
+        _log.exception("analyze_message failed")
+        return OrjsonResponse(
             status_code=200,
             content={
                 "status": "error",
@@ -292,32 +412,35 @@ async def analyze_message(request: AnalyzeRequest):
 # Alternative endpoint (backward compatibility)
 # ---------------------------------------------------------------------------
 
-@app.post("/analyze")
-async def analyze_message_alt(request: AnalyzeRequest):
+@app.post("/analyze", openapi_extra=ANALYZE_REQUEST_BODY)
+async def analyze_message_alt(request: Request):
     """Alias for /api/v1/analyze for backward compatibility."""
     return await analyze_message(request)
 
 
 # ---------------------------------------------------------------------------
-# Debug endpoint - only for testing
+# Debug endpoint - only for testing (registered when DEBUG=1)
 # ---------------------------------------------------------------------------
 
-@app.post("/debug/echo")
 async def echo_request(request: Request):
     """Echo back the raw request for debugging."""
     body = await request.body()
     try:
-        json_body = await request.json()
-    except:
+        json_body = orjson.loads(body)
+    except orjson.JSONDecodeError:
         json_body = None
     
     return {
-        "raw_body": body.decode("utf-8"),
+        "raw_body": body.decode("utf-8", "replace"),
         "parsed_json": json_body,
         "headers": dict(request.headers)
     }
 
 
+if DEBUG:
+    app.post("/debug/echo")(echo_request)
+
+
 # ---------------------------------------------------------------------------
 # Entry Point
 # ---------------------------------------------------------------------------
@@ -0,0 +1,84 @@
+"""
+Equivalence tests for the extractor entry points.
+
+extract_intelligence, extract_intelligence_hs and extract_intelligence_batch
+must return the same intelligence for the same text. The Hyperscan and
+pandas checks are skipped when those optional packages are not installed.
+
+Run with: python -m pytest test_extractor.py
+"""
+
+import random
+
+import pytest
+
+from extractor import (
+    extract_intelligence,
+    extract_intelligence_batch,
+    extract_intelligence_hs,
+)
+
+# Number of random messages compared per entry point
+RANDOM_MESSAGES = 5000
+
+# Fragments that hit (or nearly hit) every pattern, including the overlaps
+# between them: numbers in links, UPI handles inside emails, +91 prefixes
+_FRAGMENTS = [
+    "9876543210", "+919876543210", "+91-9876543210", "91 9876543210",
+    "501001234567", "12345678", "1234567890123456789", "5876543210",
+    "fraud@paytm", "9876543210@ybl", "refund@okaxis", "john.doe@gmail.com",
+    "fraud@paytm.in", "a+b@sbi.co.in", "x@y", "@", "@@",
+    "https://wa.me/919876543210", "http://paytm.me/pay?acct=501001234567&ifsc=HDFC0001234",
+    "www.hdfc-kyc.xyz/login", "bit.ly/AbC12", "https://bit.ly/x9", "tinyurl.com/k",
+    "HDFC0001234", "SBIN0ABC123", "sbin0001234", "IFSC:SBIN0001234",
+    "pay", "now", "acct", "otp", "/", ".", ",", ":", "-", "_", "(", ")",
+]
+
+_NOISE = "abcXYZ0123456789@./:-+_ \n"
+
+
+def _random_message(rng: random.Random) -> str:
+    """Glue a few fragments together with random separators and noise."""
+    parts = []
+    for _ in range(rng.randint(1, 8)):
+        if rng.random() < 0.8:
+            parts.append(rng.choice(_FRAGMENTS))
+        else:
+            parts.append("".join(rng.choice(_NOISE) for _ in range(rng.randint(1, 12))))
+        parts.append(rng.choice([" ", "", "\n", ", ", "/", "@", "."]))
+    return "".join(parts)
+
+
+@pytest.fixture(scope="module")
+def messages():
+    rng = random.Random(20260215)
+    return [_random_message(rng) for _ in range(RANDOM_MESSAGES)]
+
+
+def test_links_keep_embedded_intelligence():
+    result = extract_intelligence("https://wa.me/919876543210")
+    assert result["phone_numbers"] == ["9876543210"]
+
+    result = extract_intelligence("https://paytm.me/pay?acct=501001234567&ifsc=HDFC0001234")
+    assert result["bank_accounts"] == ["501001234567"]
+    assert result["ifsc_codes"] == ["HDFC0001234"]
+
+
+def test_emails_keep_upi_ids():
+    result = extract_intelligence("Pay to fraud@paytm.in now")
+    assert result["upi_ids"] == ["fraud@paytm"]
+    assert result["emails"] == ["fraud@paytm.in"]
+
+
+def test_hyperscan_matches_extract_intelligence(messages):
+    pytest.importorskip("hyperscan")
+    for text in messages:
+        assert extract_intelligence_hs(text) == extract_intelligence(text), text
+
+
+def test_batch_matches_extract_intelligence(messages):
+    pd = pytest.importorskip("pandas")
+    batch = extract_intelligence_batch(pd.Series(messages))
+    for text, row in zip(messages, batch.to_dict("records")):
+        row["has_intelligence"] = bool(row["has_intelligence"])
+        assert row == extract_intelligence(text), text